@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import httpx
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+DEFAULT_HOST_CONCURRENCY = 4  # 每个网站同时进行的请求数
+DEFAULT_HOST_DELAY = 0.5  # 同一网站相邻两次请求的最小间隔（秒）
+DEFAULT_API_CONCURRENCY = 8  # 每个API同时进行的请求数
+DEFAULT_MAX_CONNECTIONS = 1000  # 连接池最大连接数
+DEFAULT_FETCH_TIMEOUT = 15  # 网页请求超时时间（秒）
+DEFAULT_API_TIMEOUT = 60  # API请求超时时间（秒）
+
+
+def detect_encoding(content):
+    """根据网页内容检测编码，相当于requests的apparent_encoding"""
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return 'utf-8'
+    best = from_bytes(content).best()
+    return best.encoding if best else 'utf-8'
+
+
+def decode_content(content, encoding=None):
+    """按指定编码解码网页内容，未指定或编码无效时按内容检测"""
+    if encoding:
+        try:
+            return content.decode(encoding, errors='replace')
+        except LookupError:
+            pass
+    return content.decode(detect_encoding(content), errors='replace')
+
+
+def run_sync(func, *args, **kwargs):
+    """在新的事件循环中创建引擎并运行 `func(engine, ...)`，供同步调用方使用"""
+    async def runner():
+        async with AsyncEngine() as engine:
+            return await func(engine, *args, **kwargs)
+    return asyncio.run(runner())
+
+
+class AsyncEngine:
+    """基于asyncio的网络请求引擎
+
+    网页请求和API请求各自使用连接池复用的httpx.AsyncClient，
+    并分别按网站和按API用信号量限制并发，避免用线程承载大量并发请求。
+    需要在事件循环中通过 `async with AsyncEngine() as engine:` 使用。
+    """
+
+    def __init__(self, host_concurrency=DEFAULT_HOST_CONCURRENCY,
+                 api_concurrency=DEFAULT_API_CONCURRENCY,
+                 max_connections=DEFAULT_MAX_CONNECTIONS, host_delay=DEFAULT_HOST_DELAY):
+        self.host_concurrency = host_concurrency
+        self.api_concurrency = api_concurrency
+        self.max_connections = max_connections
+        self.host_delay = host_delay  # 同一网站相邻两次请求的最小间隔（秒）
+        self.http = None
+        self.api_http = None
+        self._openai_clients = {}
+        self._host_semaphores = {}
+        self._api_semaphores = {}
+        self._host_locks = defaultdict(asyncio.Lock)
+        self._host_last_request = defaultdict(float)
+
+    async def __aenter__(self):
+        limits = httpx.Limits(max_connections=self.max_connections,
+                              max_keepalive_connections=self.max_connections)
+        self.http = httpx.AsyncClient(headers={'User-Agent': USER_AGENT}, limits=limits,
+                                      timeout=DEFAULT_FETCH_TIMEOUT, follow_redirects=True)
+        self.api_http = httpx.AsyncClient(limits=limits, timeout=DEFAULT_API_TIMEOUT)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """关闭连接池，取消任务时也会执行"""
+        for openai_client in self._openai_clients.values():
+            await openai_client.close()
+        self._openai_clients.clear()
+        if self.http is not None:
+            await self.http.aclose()
+            self.http = None
+        if self.api_http is not None:
+            await self.api_http.aclose()
+            self.api_http = None
+
+    def host_semaphore(self, url):
+        """获取某个网站的并发信号量"""
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.host_concurrency)
+        return self._host_semaphores[host]
+
+    def api_semaphore(self, api_name):
+        """获取某个API的并发信号量"""
+        if api_name not in self._api_semaphores:
+            self._api_semaphores[api_name] = asyncio.Semaphore(self.api_concurrency)
+        return self._api_semaphores[api_name]
+
+    async def _wait_host_delay(self, url):
+        """保证同一网站相邻两次请求之间至少间隔host_delay秒"""
+        if not self.host_delay:
+            return
+        host = urlparse(url).netloc
+        loop = asyncio.get_running_loop()
+        async with self._host_locks[host]:
+            wait = self._host_last_request[host] + self.host_delay - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._host_last_request[host] = loop.time()
+
+    async def get_text(self, url, on_start=None):
+        """获取网页文本，网络错误或状态码表示失败时抛出异常
+
+        响应头声明了编码时直接使用，否则按内容检测编码，避免Shift_JIS等页面乱码。
+        编码检测较慢，在释放并发名额后放到线程中执行，不阻塞事件循环。
+        on_start在取得并发名额、真正发出请求前调用。
+        """
+        async with self.host_semaphore(url):
+            await self._wait_host_delay(url)
+            if on_start is not None:
+                on_start()
+            response = await self.http.get(url)
+        response.raise_for_status()
+        if response.charset_encoding:
+            return decode_content(response.content, response.charset_encoding)
+        return await asyncio.to_thread(decode_content, response.content)
+
+    async def post_json(self, url, payload, headers=None, timeout=DEFAULT_API_TIMEOUT):
+        """向API发送JSON请求，返回httpx.Response，不检查状态码
+
+        并发由调用方通过api_semaphore控制，以便调用方只统计请求本身的耗时。
+        """
+        return await self.api_http.post(url, json=payload, headers=headers, timeout=timeout)
+
+    def openai_client(self, api_key, base_url, max_retries=None):
+        """获取共享API连接池的AsyncOpenAI客户端，max_retries=0时关闭客户端内部重试"""
+        from openai import AsyncOpenAI
+
+        key = (api_key, base_url, max_retries)
+        if key not in self._openai_clients:
+            options = {} if max_retries is None else {"max_retries": max_retries}
+            self._openai_clients[key] = AsyncOpenAI(api_key=api_key, base_url=base_url,
+                                                    http_client=self.api_http, **options)
+        return self._openai_clients[key]
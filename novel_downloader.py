@@ -1,25 +1,49 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import requests
-from bs4 import BeautifulSoup
+import asyncio
 import re
 import time
 import os
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urlparse
 import argparse
 import json
-from openai import OpenAI
+from collections import deque
+from async_engine import (
+    AsyncEngine, DEFAULT_HOST_CONCURRENCY, DEFAULT_API_CONCURRENCY, DEFAULT_HOST_DELAY, run_sync,
+)
+from novel_pages import (
+    get_page_content_async, parse_novel_title, parse_chapter_links,
+    extract_novel_title_async, extract_chapter_content_async,
+)
+# 兼容旧的导入路径，这些同步函数现由novel_pages提供
+from novel_pages import (  # noqa: F401
+    get_page_content, extract_novel_title, extract_chapter_links, extract_chapter_content,
+)
 
 # 阿里云百炼平台的API密钥和模型名称
 DASHSCOPE_API_KEY = os.getenv('DASHSCOPE_API_KEY')  # 从环境变量读取API密钥
 DEFAULT_MODEL = "qwen-mt-plus"  # 默认使用qwen-mt-plus模型
+AUTO_MODEL = "auto"  # 自动在多个模型之间路由
 
-# 初始化OpenAI客户端用于qwen-mt-plus模型
-client = OpenAI(
-    api_key=DASHSCOPE_API_KEY,
-    base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-)
+# 自动路由参与选择的模型
+ROUTER_MODELS = ["qwen-mt-plus", "qwen-turbo-latest"]
+# 各模型估算价格（元/千token，输入、输出），以平台实际计费为准
+MODEL_PRICES = {
+    "qwen-mt-plus": (0.0018, 0.0054),
+    "qwen-turbo-latest": (0.0003, 0.0006),
+}
+LONG_TEXT_THRESHOLD = 1500  # 超过该字符数的文本视为长文本，优先保证翻译质量
+ROUTER_STATS_WINDOW = 20  # 统计错误率时参考最近的请求数
+ROUTER_ERROR_RATE_LIMIT = 0.5  # 错误率达到该值时视为降级
+ROUTER_MIN_SAMPLES = 5  # 至少有这么多次请求结果后才按错误率判断降级
+ROUTER_SLOW_LATENCY = 45  # 平均延迟超过该秒数时视为降级
+ROUTER_LATENCY_ALPHA = 0.3  # 延迟指数移动平均的平滑系数
+ROUTER_THROTTLE_COOLDOWN = 60  # 被限流后暂停使用该模型的秒数
+ROUTER_PROBE_INTERVAL = 120  # 降级的模型闲置超过该秒数后重新发送探测请求
+
+DASHSCOPE_COMPATIBLE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+DASHSCOPE_GENERATION_URL = "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation"
 
 def is_chinese(text):
     """检查文本是否包含中文字符"""
@@ -78,10 +102,10 @@ def is_likely_japanese(text):
     
     return False
 
-def translate_to_chinese(text, model_name=DEFAULT_MODEL):
-    """使用阿里云百炼平台的Qwen模型将文本翻译为中文"""
+def prepare_translation_text(text):
+    """检测文本语言，需要翻译时返回截断后的待翻译文本，否则返回None"""
     if not text:
-        return text
+        return None
         
     # 使用更复杂的规则判断是否需要翻译
     likely_japanese = is_likely_japanese(text)
@@ -93,7 +117,7 @@ def translate_to_chinese(text, model_name=DEFAULT_MODEL):
     # 如果明显是中文且不包含日文特征，则不需要翻译
     if has_chinese and not likely_japanese:
         print("内容已为中文，无需翻译")
-        return text
+        return None
     
     # 如果可能是日文，则进行翻译
     if likely_japanese or not has_chinese:
@@ -108,199 +132,363 @@ def translate_to_chinese(text, model_name=DEFAULT_MODEL):
         # 只取前1000个字符进行测试
         test_text = text[:1000] + "..." if len(text) > 1000 else text
         print(f"待翻译文本示例: {test_text}")
-        
-        # 根据模型名称选择不同的调用方法
-        if model_name == "qwen-mt-plus":
-            return translate_with_qwen_mt_plus(text)
-        else:
-            return translate_with_qwen_turbo(text, model_name)
+        return text
     else:
         # 已经是中文或混合文本
         print("内容已为中文，无需翻译")
-        return text
+        return None
 
 
-def translate_with_qwen_mt_plus(text):
-    """使用qwen-mt-plus模型翻译文本"""
-    try:
-        # 使用翻译选项而不是系统提示词
-        translation_options = {
-            "source_lang": "auto",
-            "target_lang": "Chinese"
-        }
-        
-        # 增加重试机制
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                completion = client.chat.completions.create(
-                    model="qwen-mt-plus",
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": text
-                        }
-                    ],
-                    extra_body={
-                        "translation_options": translation_options
-                    },
-                    # 增加超时时间
-                    timeout=60
-                )
-                
-                if completion.choices and completion.choices[0].message.content:
-                    print("翻译完成")
-                    return completion.choices[0].message.content
-                else:
-                    error_msg = "未知错误"
-                    print(f"翻译失败: {error_msg}")
-                    # 如果不是最后一次尝试，等待后重试
-                    if attempt < max_retries - 1:
-                        print(f"第{attempt + 1}次尝试失败，等待5秒后重试...")
-                        time.sleep(5)
-                    else:
-                        print("所有重试都失败了，返回原文")
-                        return text
-            except Exception as e:
-                print(f"第{attempt + 1}次翻译请求出错: {e}")
-                if attempt < max_retries - 1:
-                    print("等待5秒后重试...")
-                    time.sleep(5)
-                else:
-                    print("所有重试都失败了，返回原文")
-                    return text
-    except Exception as e:
-        print(f"翻译过程中出错: {e}")
-        import traceback
-        traceback.print_exc()
+async def translate_to_chinese_async(engine, text, model_name=DEFAULT_MODEL, router=None):
+    """使用阿里云百炼平台的Qwen模型将文本翻译为中文，传入router时按块自动选择模型"""
+    source_text = prepare_translation_text(text)
+    if source_text is None:
         return text
+    
+    # 根据模型名称选择不同的调用方法
+    if router is not None:
+        return await router.translate_async(engine, source_text)
+    return await translate_with_model_async(engine, source_text, model_name)
 
 
-def translate_with_qwen_turbo(text, model_name):
-    """使用qwen-turbo模型翻译文本"""
+def translate_to_chinese(text, model_name=DEFAULT_MODEL, router=None):
+    """translate_to_chinese_async的同步版本"""
+    return run_sync(translate_to_chinese_async, text, model_name, router)
+
+
+class TranslationError(Exception):
+    """单次翻译请求失败，throttled表示是否被平台限流"""
+
+    def __init__(self, message, throttled=False):
+        super().__init__(message)
+        self.throttled = throttled
+
+
+async def request_qwen_mt_plus_async(engine, text, max_retries=None):
+    """调用一次qwen-mt-plus模型，成功返回译文，失败抛出TranslationError
+
+    max_retries=0时关闭客户端内部对限流的重试，让调用方立即感知限流。
+    并发由调用方通过engine.api_semaphore控制。
+    """
+    from openai import RateLimitError
+
+    async_client = engine.openai_client(DASHSCOPE_API_KEY, DASHSCOPE_COMPATIBLE_URL, max_retries)
     try:
-        import dashscope
-        dashscope.api_key = DASHSCOPE_API_KEY
-        
-        # 使用标准Generation接口
-        prompt = f"请将以下日文小说内容翻译成中文，保持原文的语气和风格：\n\n{text}"
-        
-        # 增加重试机制
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = dashscope.Generation.call(
-                    model=model_name,
-                    prompt=prompt,
-                    # 增加超时时间
-                    timeout=60
-                )
-                
-                if response.status_code == 200 and response.output and response.output.text:
-                    print("翻译完成")
-                    return response.output.text
-                else:
-                    error_msg = response.message if response and response.message else "未知错误"
-                    print(f"翻译失败: {error_msg}")
-                    # 打印响应详情用于调试
-                    if hasattr(response, '__dict__'):
-                        print(f"响应详情: {response.__dict__}")
-                    # 如果不是最后一次尝试，等待后重试
-                    if attempt < max_retries - 1:
-                        print(f"第{attempt + 1}次尝试失败，等待5秒后重试...")
-                        time.sleep(5)
-                    else:
-                        print("所有重试都失败了，返回原文")
-                        return text
-            except Exception as e:
-                print(f"第{attempt + 1}次翻译请求出错: {e}")
-                if attempt < max_retries - 1:
-                    print("等待5秒后重试...")
-                    time.sleep(5)
-                else:
-                    print("所有重试都失败了，返回原文")
-                    return text
-    except ImportError:
-        print("未安装dashscope库，无法进行翻译")
-        return text
-    except Exception as e:
-        print(f"翻译过程中出错: {e}")
-        import traceback
-        traceback.print_exc()
-        return text
+        completion = await async_client.chat.completions.create(
+            model="qwen-mt-plus",
+            messages=[
+                {
+                    "role": "user",
+                    "content": text
+                }
+            ],
+            # 使用翻译选项而不是系统提示词
+            extra_body={
+                "translation_options": {
+                    "source_lang": "auto",
+                    "target_lang": "Chinese"
+                }
+            },
+            # 增加超时时间
+            timeout=60
+        )
+    except RateLimitError as e:
+        raise TranslationError(f"请求被限流: {e}", throttled=True) from e
+
+    if completion.choices and completion.choices[0].message.content:
+        return completion.choices[0].message.content
+    raise TranslationError("未知错误")
 
-def get_page_content(url):
-    """获取网页内容"""
+
+async def request_qwen_turbo_async(engine, text, model_name):
+    """调用一次qwen-turbo系列模型，直接请求Generation的HTTP接口，失败抛出TranslationError"""
     headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+        "Authorization": f"Bearer {DASHSCOPE_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": model_name,
+        "input": {
+            "prompt": f"请将以下日文小说内容翻译成中文，保持原文的语气和风格：\n\n{text}"
+        }
     }
+
+    response = await engine.post_json(DASHSCOPE_GENERATION_URL, payload, headers=headers, timeout=60)
     try:
-        response = requests.get(url, headers=headers, timeout=15)  # 增加超时时间
-        response.encoding = response.apparent_encoding
-        return response.text
-    except Exception as e:
-        print(f"获取页面内容失败: {e}")
-        return None
+        result = response.json()
+    except ValueError:
+        result = {}
 
-def extract_novel_title(catalog_url):
-    """从目录页提取小说标题"""
-    html_content = get_page_content(catalog_url)
-    if not html_content:
-        return None
-    
-    soup = BeautifulSoup(html_content, 'html.parser')
-    title_element = soup.select_one('.p-novel__title')
-    if title_element:
-        return title_element.get_text(strip=True)
-    return None
-
-def extract_chapter_links(catalog_url):
-    """从目录页提取章节链接"""
-    html_content = get_page_content(catalog_url)
-    if not html_content:
-        return []
-    
-    soup = BeautifulSoup(html_content, 'html.parser')
-    chapter_links = []
-    
-    # 查找所有章节链接
-    for link in soup.select('.p-eplist__sublist a'):
-        href = link.get('href')
-        title = link.get_text(strip=True)
-        if href:
-            full_url = urljoin(catalog_url, href)
-            chapter_links.append((title, full_url))
-    
-    return chapter_links
+    output_text = (result.get("output") or {}).get("text")
+    if response.status_code == 200 and output_text:
+        return output_text
 
-def extract_chapter_content(chapter_url):
-    """从章节页提取标题和内容"""
-    html_content = get_page_content(chapter_url)
-    if not html_content:
-        return None, None
-    
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # 提取标题
-    title_element = soup.select_one('.p-novel__title')
-    title = title_element.get_text(strip=True) if title_element else "未知章节"
-    
-    # 提取内容
-    content_elements = soup.select('.p-novel__text p')
-    content = '\\n'.join([p.get_text() for p in content_elements])
-    
-    # 如果没有找到内容，尝试其他选择器
-    if not content:
-        content_elements = soup.select('#novel_honbun p')
-        content = '\\n'.join([p.get_text() for p in content_elements])
-    
-    # 如果仍然没有找到内容，获取所有可能的文本
-    if not content:
-        content_elements = soup.find_all('p')
-        content = '\\n'.join([p.get_text() for p in content_elements])
-    
-    print(f"提取到章节内容，长度: {len(content)} 字符")
-    return title, content
+    error_msg = result.get("message") or "未知错误"
+    throttled = response.status_code == 429 or 'Throttling' in str(result.get("code", ''))
+    raise TranslationError(error_msg, throttled=throttled)
+
+
+async def request_translation_async(engine, text, model_name, max_retries=None):
+    """根据模型名称调用一次对应的翻译接口"""
+    if model_name == "qwen-mt-plus":
+        return await request_qwen_mt_plus_async(engine, text, max_retries)
+    return await request_qwen_turbo_async(engine, text, model_name)
+
+
+async def translate_with_model_async(engine, text, model_name):
+    """使用指定模型翻译文本，失败时重试，全部失败返回原文"""
+    # 增加重试机制
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            async with engine.api_semaphore(model_name):
+                result = await request_translation_async(engine, text, model_name)
+            print("翻译完成")
+            return result
+        except Exception as e:
+            print(f"第{attempt + 1}次翻译请求出错: {e}")
+            if attempt < max_retries - 1:
+                print("等待5秒后重试...")
+                await asyncio.sleep(5)
+            else:
+                print("所有重试都失败了，返回原文")
+                return text
+
+
+def translate_with_qwen_mt_plus(text):
+    """使用qwen-mt-plus模型翻译文本"""
+    return run_sync(translate_with_model_async, text, "qwen-mt-plus")
+
+
+def translate_with_qwen_turbo(text, model_name):
+    """使用qwen-turbo模型翻译文本"""
+    return run_sync(translate_with_model_async, text, model_name)
+
+
+class ModelRouter:
+    """在qwen-mt-plus和qwen-turbo-latest之间按块自动选择翻译模型
+
+    选择依据：文本长度（长文本优先质量更好的qwen-mt-plus，短文本优先更便宜的模型）、
+    各模型实时测得的延迟和错误率、以及成本预算。被限流的模型会冷却一段时间，
+    期间请求自动切换到另一个模型。每次路由决策都会记录下来。
+    """
+
+    def __init__(self, budget=None, log_file=None, models=None,
+                 long_text_threshold=LONG_TEXT_THRESHOLD):
+        self.models = list(models or ROUTER_MODELS)
+        self.budget = budget
+        self.log_file = log_file
+        self.long_text_threshold = long_text_threshold
+        self.spent = 0.0
+        self.reserved = 0.0  # 已发出但尚未完成的请求预留的估算费用
+        self.decisions = []
+        self.stats = {
+            model: {
+                "results": deque(maxlen=ROUTER_STATS_WINDOW),  # 最近若干次请求是否成功
+                "latency": None,  # 延迟的指数移动平均（秒）
+                "cooldown_until": 0.0,  # 限流冷却结束时间
+                "last_attempt": 0.0,  # 最近一次请求的时间
+            }
+            for model in self.models
+        }
+
+    def estimate_cost(self, model, text):
+        """估算翻译一段文本的费用（元），按每个字符约一个token、译文与原文等长估算"""
+        input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        return len(text) / 1000 * (input_price + output_price)
+
+    def error_rate(self, model):
+        results = self.stats[model]["results"]
+        if not results:
+            return 0.0
+        return results.count(False) / len(results)
+
+    def is_throttled(self, model, now=None):
+        now = time.time() if now is None else now
+        return self.stats[model]["cooldown_until"] > now
+
+    def has_poor_stats(self, model):
+        """错误率过高（样本数不少于ROUTER_MIN_SAMPLES）或平均延迟过长"""
+        latency = self.stats[model]["latency"]
+        enough_samples = len(self.stats[model]["results"]) >= ROUTER_MIN_SAMPLES
+        return ((enough_samples and self.error_rate(model) >= ROUTER_ERROR_RATE_LIMIT)
+                or (latency is not None and latency > ROUTER_SLOW_LATENCY))
+
+    def is_degraded(self, model, now=None):
+        """统计数据较差的模型视为降级，闲置超过ROUTER_PROBE_INTERVAL秒后不再降级，以便发送探测请求"""
+        if not self.has_poor_stats(model):
+            return False
+        now = time.time() if now is None else now
+        return now - self.stats[model]["last_attempt"] < ROUTER_PROBE_INTERVAL
+
+    def is_over_budget(self, model, text):
+        if self.budget is None:
+            return False
+        return self.spent + self.reserved + self.estimate_cost(model, text) > self.budget
+
+    def is_unavailable(self, model, text):
+        """被限流或超出预算的模型暂时不可用"""
+        return self.is_throttled(model) or self.is_over_budget(model, text)
+
+    def reserve(self, model, text):
+        """做出路由决策时预留估算费用，返回预留的金额，由record释放"""
+        cost = self.estimate_cost(model, text)
+        self.reserved += cost
+        return cost
+
+    def preferred_model(self, text):
+        """长文本优先使用专用翻译模型保证质量，短文本优先使用最便宜的模型"""
+        if len(text) >= self.long_text_threshold and "qwen-mt-plus" in self.models:
+            return "qwen-mt-plus"
+        return min(self.models, key=lambda model: self.estimate_cost(model, "x" * 1000))
+
+    def rank(self, text, exclude=()):
+        """返回按优先级排序的候选模型列表以及选择原因，exclude中的模型不参与排序"""
+        now = time.time()
+        preferred = self.preferred_model(text)
+        models = [model for model in self.models if model not in exclude]
+
+        # 所有模型都超出预算时不再偏向首选模型，而是按费用从低到高排序
+        all_over_budget = all(self.is_over_budget(model, text) for model in models)
+
+        def sort_key(model):
+            latency = self.stats[model]["latency"]
+            return (
+                self.is_throttled(model, now),
+                self.is_over_budget(model, text),
+                self.estimate_cost(model, text) if all_over_budget else 0.0,
+                self.is_degraded(model, now),
+                model != preferred,
+                latency if latency is not None else 0.0,
+            )
+
+        ranked = sorted(models, key=sort_key)
+        chosen = ranked[0]
+        reasons = []
+        if all_over_budget:
+            reasons.append("所有模型均超出预算，选择最便宜的模型")
+        elif chosen == preferred:
+            reasons.append("长文本优先质量" if len(text) >= self.long_text_threshold else "短文本优先成本")
+        else:
+            if self.is_throttled(preferred, now):
+                reasons.append(f"{preferred}被限流")
+            if self.is_over_budget(preferred, text):
+                reasons.append(f"{preferred}超出预算")
+            if self.is_degraded(preferred, now):
+                reasons.append(f"{preferred}错误率或延迟过高")
+        return ranked, "，".join(reasons) or "延迟更低"
+
+    def record(self, model, text, latency, success, throttled=False,
+               candidates=None, reason="", fallback=False, error=None, reserved=0.0):
+        """记录一次请求结果，更新模型统计并写入路由日志，同时释放预留的费用"""
+        self.reserved -= reserved
+        stats = self.stats[model]
+        if success and self.has_poor_stats(model):
+            # 降级模型的探测请求成功，丢弃旧的统计数据使其恢复
+            stats["results"].clear()
+            stats["latency"] = None
+        # 限流由冷却时间处理，不计入错误率，避免一次限流让模型被降级
+        if not throttled:
+            stats["results"].append(success)
+        stats["last_attempt"] = time.time()
+        # 失败的请求往往很快返回，只用成功请求的耗时计算延迟
+        if success:
+            if stats["latency"] is None:
+                stats["latency"] = latency
+            else:
+                stats["latency"] = (ROUTER_LATENCY_ALPHA * latency
+                                    + (1 - ROUTER_LATENCY_ALPHA) * stats["latency"])
+        if throttled:
+            stats["cooldown_until"] = time.time() + ROUTER_THROTTLE_COOLDOWN
+
+        cost = self.estimate_cost(model, text) if success else 0.0
+        self.spent += cost
+
+        decision = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "text_length": len(text),
+            "candidates": candidates or [model],
+            "model": model,
+            "reason": reason,
+            "fallback": fallback,
+            "success": success,
+            "throttled": throttled,
+            "latency": round(latency, 3),
+            "estimated_cost": round(cost, 6),
+            "spent": round(self.spent, 6),
+            "error": error,
+        }
+        self.decisions.append(decision)
+        print(f"路由决策: 模型={model}, 原因={reason}, 成功={success}, 延迟={latency:.2f}秒, 累计费用≈{self.spent:.4f}元")
+        if self.log_file:
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(decision, ensure_ascii=False) + "\n")
+
+    def summary(self):
+        """汇总各模型的使用情况"""
+        lines = [f"路由汇总: 共{len(self.decisions)}次请求，累计费用约{self.spent:.4f}元"]
+        for model in self.models:
+            used = [d for d in self.decisions if d["model"] == model]
+            succeeded = sum(1 for d in used if d["success"])
+            latency = self.stats[model]["latency"]
+            latency_text = f"{latency:.2f}秒" if latency is not None else "无数据"
+            lines.append(f"  {model}: 请求{len(used)}次，成功{succeeded}次，平均延迟{latency_text}")
+        return "\n".join(lines)
+
+    async def translate_async(self, engine, text):
+        """按路由顺序尝试各模型，失败或被限流时切换到下一个模型
+
+        每个模型使用各自的并发名额。取得名额后重新做路由决策并预留估算费用，
+        保证决策基于最新的统计和花费；记录的延迟只包含请求本身的耗时，不包含本地排队时间。
+        """
+        max_rounds = 3
+        for attempt in range(max_rounds):
+            tried = []
+            reason = None
+            switches = 0
+            while len(tried) < len(self.models):
+                candidates, rank_reason = self.rank(text, exclude=tried)
+                model = candidates[0]
+                async with engine.api_semaphore(model):
+                    # 排队期间限流状态和花费可能已变化，若该模型已不可用而其他模型可用则改选
+                    candidates, rank_reason = self.rank(text, exclude=tried)
+                    if (candidates[0] != model and switches < len(self.models)
+                            and self.is_unavailable(model, text)
+                            and not self.is_unavailable(candidates[0], text)):
+                        switches += 1
+                        continue
+                    ranking = tried + candidates
+                    reserved = self.reserve(model, text)
+                    start = time.time()
+                    try:
+                        # 关闭客户端内部重试，被限流时立即切换模型
+                        result = await request_translation_async(engine, text, model, max_retries=0)
+                    except Exception as e:
+                        throttled = isinstance(e, TranslationError) and e.throttled
+                        print(f"{model}翻译请求出错: {e}")
+                        self.record(model, text, time.time() - start, False, throttled=throttled,
+                                    candidates=ranking, reason=reason or rank_reason,
+                                    fallback=bool(tried), error=str(e), reserved=reserved)
+                        reason = f"{model}请求失败，切换模型"
+                        tried.append(model)
+                        continue
+                    except BaseException:
+                        # 任务被取消时释放预留的费用
+                        self.reserved -= reserved
+                        raise
+                    self.record(model, text, time.time() - start, True, candidates=ranking,
+                                reason=reason or rank_reason, fallback=bool(tried), reserved=reserved)
+                    print("翻译完成")
+                    return result
+            if attempt < max_rounds - 1:
+                print(f"第{attempt + 1}轮所有模型均失败，等待5秒后重试...")
+                await asyncio.sleep(5)
+        print("所有重试都失败了，返回原文")
+        return text
+
+    def translate(self, text):
+        """translate_async的同步版本"""
+        return run_sync(self.translate_async, text)
 
 def save_to_txt(chapters, filename):
     """将章节内容保存到txt文件"""
@@ -352,50 +540,101 @@ def generate_default_filename(novel_title, start_chapter=None, end_chapter=None)
     
     return filename + ".txt"
 
-def main():
-    parser = argparse.ArgumentParser(description='下载小说并翻译为中文')
-    parser.add_argument('url', help='小说的目录页或章节页URL')
-    parser.add_argument('--output', '-o', help='输出文件名')
-    parser.add_argument('--range', '-r', help='章节范围，例如 "1-10" 表示第1到第10章，"5" 表示第5章')
-    parser.add_argument('--model', '-m', default=DEFAULT_MODEL, choices=['qwen-turbo-latest', 'qwen-mt-plus'], help='选择翻译模型')
-    args = parser.parse_args()
-    
-    url = args.url
-    start_chapter, end_chapter = parse_chapter_range(args.range)
-    
-    # 检查是否设置了API密钥
-    if not DASHSCOPE_API_KEY:
-        print("警告: 未设置DASHSCOPE_API_KEY环境变量，将不会进行翻译")
+async def download_chapters_async(engine, chapter_links, output_file, start_chapter=None,
+                                  model_name=DEFAULT_MODEL, router=None):
+    """并发下载并翻译章节，任务被取消时也会把已完成的章节按顺序保存到文件
+
+    缺失的章节（下载失败或被中断）在文件中以占位说明标出，避免章节顺序出现无法察觉的空缺。
+    """
+    # None表示尚未完成，False表示下载失败，否则为(标题, 内容)
+    results = [None] * len(chapter_links)
+
+    def chapter_number(index):
+        # 计算实际章节号
+        return start_chapter + index if start_chapter is not None else index + 1
+
+    async def download_chapter(index, title, link):
+        actual_chapter_num = chapter_number(index)
+        chapter_title, content = await extract_chapter_content_async(
+            engine, link, on_start=lambda: print(f"正在下载第 {actual_chapter_num} 章: {title}"))
+        
+        if chapter_title and content:
+            print(f"检测到章节语言...")
+            content = await translate_to_chinese_async(engine, content, model_name, router)
+            results[index] = (chapter_title, content)
+            print(f"第 {actual_chapter_num} 章处理完成")
+        else:
+            results[index] = False
+            print(f"无法下载章节: {title}")
+
+    tasks = [asyncio.create_task(download_chapter(index, title, link))
+             for index, (title, link) in enumerate(chapter_links)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # 取消尚未完成的任务并等待其结束，再保存已完成的章节
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        completed = sum(1 for result in results if result)
+        chapters = []
+        if completed:
+            for index, result in enumerate(results):
+                if result:
+                    chapters.append(result)
+                    continue
+                title = chapter_links[index][0]
+                note = "下载失败" if result is False else "下载被中断，未完成"
+                chapters.append((f"第 {chapter_number(index)} 章: {title}", f"[本章缺失：{note}]"))
+            if completed < len(chapter_links):
+                print(f"已完成 {completed}/{len(chapter_links)} 章，缺失的章节已在文件中标出")
+            save_to_txt(chapters, output_file)
+        else:
+            print("没有成功下载任何章节")
+    return chapters
+
+async def download_novel_async(url, output=None, range_str=None, model_name=DEFAULT_MODEL,
+                               router=None, host_concurrency=DEFAULT_HOST_CONCURRENCY,
+                               api_concurrency=DEFAULT_API_CONCURRENCY, host_delay=DEFAULT_HOST_DELAY):
+    """下载目录页或章节页对应的小说并翻译为中文"""
+    start_chapter, end_chapter = parse_chapter_range(range_str)
     
     # 判断是目录页还是章节页
     parsed_url = urlparse(url)
     path_parts = parsed_url.path.strip('/').split('/')
     
-    if len(path_parts) >= 2 and path_parts[-1].isdigit():
-        # 章节页
-        print("检测到章节页URL，直接下载该章节...")
-        title, content = extract_chapter_content(url)
-        if title and content:
-            print(f"检测到章节语言...")
-            # 使用新的语言检测函数
-            content = translate_to_chinese(content, args.model)
-            
-            # 生成默认文件名
-            if args.output:
-                output_file = args.output
+    async with AsyncEngine(host_concurrency=host_concurrency, api_concurrency=api_concurrency,
+                           host_delay=host_delay) as engine:
+        if len(path_parts) >= 2 and path_parts[-1].isdigit():
+            # 章节页
+            print("检测到章节页URL，直接下载该章节...")
+            title, content = await extract_chapter_content_async(engine, url)
+            if title and content:
+                print(f"检测到章节语言...")
+                # 使用新的语言检测函数
+                content = await translate_to_chinese_async(engine, content, model_name, router)
+                
+                # 生成默认文件名
+                if output:
+                    output_file = output
+                else:
+                    # 尝试从URL中提取小说标题
+                    catalog_url = "/".join(url.split("/")[:-2]) + "/"
+                    novel_title = await extract_novel_title_async(engine, catalog_url)
+                    output_file = generate_default_filename(novel_title)
+                
+                save_to_txt([(title, content)], output_file)
             else:
-                # 尝试从URL中提取小说标题
-                catalog_url = "/".join(url.split("/")[:-2]) + "/"
-                novel_title = extract_novel_title(catalog_url)
-                output_file = generate_default_filename(novel_title)
-            
-            save_to_txt([(title, content)], output_file)
-        else:
-            print("无法提取章节内容")
-    else:
-        # 目录页
+                print("无法提取章节内容")
+            return
+        
+        # 目录页，只请求一次，同时解析章节链接和小说标题
         print("检测到目录页URL，正在提取所有章节链接...")
-        chapter_links = extract_chapter_links(url)
+        html_content = await get_page_content_async(engine, url)
+        chapter_links = (await asyncio.to_thread(parse_chapter_links, html_content, url)
+                         if html_content else [])
         
         if not chapter_links:
             print("未找到章节链接")
@@ -412,7 +651,7 @@ def main():
             end_idx = min(len(chapter_links), end_idx)
             
             chapter_links = chapter_links[start_idx:end_idx]
-            print(f"根据指定范围 {args.range}，将下载第 {start_chapter if start_chapter else 1} 到第 {end_chapter if end_chapter else len(chapter_links)+start_idx} 章")
+            print(f"根据指定范围 {range_str}，将下载第 {start_chapter if start_chapter else 1} 到第 {end_chapter if end_chapter else len(chapter_links)+start_idx} 章")
         else:
             print(f"找到 {len(chapter_links)} 个章节，开始下载...")
         
@@ -420,37 +659,45 @@ def main():
             print("指定的章节范围无效")
             return
         
-        chapters = []
-        
-        for i, (title, link) in enumerate(chapter_links, start=1):
-            # 计算实际章节号
-            actual_chapter_num = start_chapter + i - 1 if start_chapter is not None else i
-            print(f"正在下载第 {actual_chapter_num} 章: {title}")
-            chapter_title, content = extract_chapter_content(link)
-            
-            if chapter_title and content:
-                print(f"检测到章节语言...")
-                # 使用新的语言检测函数
-                content = translate_to_chinese(content, args.model)
-                
-                chapters.append((chapter_title, content))
-                # 添加延时，避免请求过于频繁
-                time.sleep(2)  # 增加延迟时间
-            else:
-                print(f"无法下载章节: {title}")
-        
-        if chapters:
-            # 生成默认文件名
-            if args.output:
-                output_file = args.output
-            else:
-                # 提取小说标题
-                novel_title = extract_novel_title(url)
-                output_file = generate_default_filename(novel_title, start_chapter, end_chapter)
-            
-            save_to_txt(chapters, output_file)
+        # 生成默认文件名
+        if output:
+            output_file = output
         else:
-            print("没有成功下载任何章节")
+            novel_title = await asyncio.to_thread(parse_novel_title, html_content)
+            output_file = generate_default_filename(novel_title, start_chapter, end_chapter)
+        
+        await download_chapters_async(engine, chapter_links, output_file, start_chapter,
+                                      model_name, router)
+
+def main():
+    parser = argparse.ArgumentParser(description='下载小说并翻译为中文')
+    parser.add_argument('url', help='小说的目录页或章节页URL')
+    parser.add_argument('--output', '-o', help='输出文件名')
+    parser.add_argument('--range', '-r', help='章节范围，例如 "1-10" 表示第1到第10章，"5" 表示第5章')
+    parser.add_argument('--model', '-m', default=DEFAULT_MODEL, choices=['qwen-turbo-latest', 'qwen-mt-plus', AUTO_MODEL], help='选择翻译模型，auto表示按块自动路由')
+    parser.add_argument('--budget', type=float, help='自动路由模式下的费用预算（元），超出后优先使用更便宜的模型')
+    parser.add_argument('--route-log', help='自动路由模式下记录每次路由决策的日志文件（JSON Lines）')
+    parser.add_argument('--concurrency', '-c', type=int, default=DEFAULT_HOST_CONCURRENCY, help='每个网站同时下载的章节数')
+    parser.add_argument('--api-concurrency', type=int, default=DEFAULT_API_CONCURRENCY, help='每个翻译API同时进行的请求数')
+    parser.add_argument('--delay', type=float, default=DEFAULT_HOST_DELAY, help='同一网站相邻两次请求的最小间隔（秒），避免请求过于频繁')
+    args = parser.parse_args()
+    
+    # 检查是否设置了API密钥
+    if not DASHSCOPE_API_KEY:
+        print("警告: 未设置DASHSCOPE_API_KEY环境变量，将不会进行翻译")
+
+    router = None
+    if args.model == AUTO_MODEL:
+        router = ModelRouter(budget=args.budget, log_file=args.route_log)
+    
+    try:
+        asyncio.run(download_novel_async(args.url, args.output, args.range, args.model, router,
+                                         args.concurrency, args.api_concurrency, args.delay))
+    except KeyboardInterrupt:
+        print("下载已中断")
+    finally:
+        if router is not None and router.decisions:
+            print(router.summary())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin
+
+from async_engine import run_sync
+
+
+async def get_page_content_async(engine, url, on_start=None):
+    """获取网页内容"""
+    try:
+        return await engine.get_text(url, on_start=on_start)
+    except Exception as e:
+        print(f"获取页面内容失败: {e}")
+        return None
+
+def parse_novel_title(html_content):
+    """从目录页HTML中解析小说标题"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    title_element = soup.select_one('.p-novel__title')
+    if title_element:
+        return title_element.get_text(strip=True)
+    return None
+
+def parse_chapter_links(html_content, catalog_url):
+    """从目录页HTML中解析章节链接"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    chapter_links = []
+
+    # 查找所有章节链接
+    for link in soup.select('.p-eplist__sublist a'):
+        href = link.get('href')
+        title = link.get_text(strip=True)
+        if href:
+            full_url = urljoin(catalog_url, href)
+            chapter_links.append((title, full_url))
+
+    return chapter_links
+
+def parse_chapter_content(html_content):
+    """从章节页HTML中解析标题和内容"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    # 提取标题
+    title_element = soup.select_one('.p-novel__title')
+    title = title_element.get_text(strip=True) if title_element else "未知章节"
+
+    # 提取内容
+    content_elements = soup.select('.p-novel__text p')
+    content = '\n'.join([p.get_text() for p in content_elements])
+
+    # 如果没有找到内容，尝试其他选择器
+    if not content:
+        content_elements = soup.select('#novel_honbun p')
+        content = '\n'.join([p.get_text() for p in content_elements])
+
+    # 如果仍然没有找到内容，获取所有可能的文本
+    if not content:
+        content_elements = soup.find_all('p')
+        content = '\n'.join([p.get_text() for p in content_elements])
+
+    print(f"提取到章节内容，长度: {len(content)} 字符")
+    return title, content
+
+# 异步版本的HTML解析在线程中执行，避免阻塞事件循环
+
+async def extract_novel_title_async(engine, catalog_url):
+    """从目录页提取小说标题"""
+    html_content = await get_page_content_async(engine, catalog_url)
+    if not html_content:
+        return None
+    return await asyncio.to_thread(parse_novel_title, html_content)
+
+async def extract_chapter_links_async(engine, catalog_url):
+    """从目录页提取章节链接"""
+    html_content = await get_page_content_async(engine, catalog_url)
+    if not html_content:
+        return []
+    return await asyncio.to_thread(parse_chapter_links, html_content, catalog_url)
+
+async def extract_chapter_content_async(engine, chapter_url, on_start=None):
+    """从章节页提取标题和内容"""
+    html_content = await get_page_content_async(engine, chapter_url, on_start)
+    if not html_content:
+        return None, None
+    return await asyncio.to_thread(parse_chapter_content, html_content)
+
+# 同步版本，在独立的事件循环中运行对应的异步函数
+
+def get_page_content(url):
+    """获取网页内容"""
+    return run_sync(get_page_content_async, url)
+
+def extract_novel_title(catalog_url):
+    """从目录页提取小说标题"""
+    return run_sync(extract_novel_title_async, catalog_url)
+
+def extract_chapter_links(catalog_url):
+    """从目录页提取章节链接"""
+    return run_sync(extract_chapter_links_async, catalog_url)
+
+def extract_chapter_content(chapter_url):
+    """从章节页提取标题和内容"""
+    return run_sync(extract_chapter_content_async, chapter_url)
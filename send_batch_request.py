@@ -1,18 +1,22 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import requests
 import json
 import argparse
-import time
 import os
 
+from async_engine import run_sync
+
 # 阿里云百炼平台的API配置
 DASHSCOPE_API_KEY = os.getenv('DASHSCOPE_API_KEY')
 API_URL = "https://dashscope.aliyuncs.com/api/v1/services/translateto/chinese"
 
 def send_batch_request(batch_file, output_file, model_name='qwen-mt-plus'):
     """发送批处理请求到阿里云百炼平台"""
+    run_sync(send_batch_request_async, batch_file, output_file, model_name)
+
+async def send_batch_request_async(engine, batch_file, output_file, model_name='qwen-mt-plus'):
+    """send_batch_request的异步版本，使用传入的AsyncEngine发送请求"""
     if not DASHSCOPE_API_KEY:
         print("错误: 未设置DASHSCOPE_API_KEY环境变量")
         return
@@ -65,7 +69,8 @@ def send_batch_request(batch_file, output_file, model_name='qwen-mt-plus'):
     print("正在发送批处理请求...")
     
     try:
-        response = requests.post(API_URL, headers=headers, json=payload)
+        async with engine.api_semaphore("batch"):
+            response = await engine.post_json(API_URL, payload, headers=headers, timeout=None)
         
         if response.status_code == 200:
             result = response.json()
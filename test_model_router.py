@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import novel_downloader
+from novel_downloader import ModelRouter, ROUTER_MIN_SAMPLES, ROUTER_PROBE_INTERVAL, ROUTER_THROTTLE_COOLDOWN
+
+LONG_TEXT = "あ" * 2000
+SHORT_TEXT = "あ" * 100
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手动推进的时钟，替换路由器使用的time.time"""
+    now = [1000.0]
+    monkeypatch.setattr(novel_downloader.time, "time", lambda: now[0])
+    return now
+
+
+def test_long_text_prefers_mt_plus_and_short_text_prefers_cheaper():
+    router = ModelRouter()
+    assert router.rank(LONG_TEXT)[0] == ["qwen-mt-plus", "qwen-turbo-latest"]
+    assert router.rank(SHORT_TEXT)[0] == ["qwen-turbo-latest", "qwen-mt-plus"]
+
+
+def test_cold_start_failure_does_not_degrade(clock):
+    router = ModelRouter()
+    router.record("qwen-mt-plus", LONG_TEXT, 5.0, False)
+    assert router.rank(LONG_TEXT)[0][0] == "qwen-mt-plus"
+
+
+def test_error_rate_degrades_after_min_samples(clock):
+    router = ModelRouter()
+    for _ in range(ROUTER_MIN_SAMPLES):
+        router.record("qwen-mt-plus", LONG_TEXT, 5.0, False)
+    ranked, reason = router.rank(LONG_TEXT)
+    assert ranked[0] == "qwen-turbo-latest"
+    assert "错误率" in reason
+
+
+def test_degraded_model_recovers_after_successful_probe(clock):
+    router = ModelRouter()
+    for _ in range(ROUTER_MIN_SAMPLES):
+        router.record("qwen-mt-plus", LONG_TEXT, 5.0, False)
+    clock[0] += ROUTER_PROBE_INTERVAL + 1
+    assert router.rank(LONG_TEXT)[0][0] == "qwen-mt-plus"
+
+    router.record("qwen-mt-plus", LONG_TEXT, 3.0, True)
+    assert list(router.stats["qwen-mt-plus"]["results"]) == [True]
+    # 探测成功后的一次失败不应再次降级
+    router.record("qwen-mt-plus", LONG_TEXT, 5.0, False)
+    assert router.rank(LONG_TEXT)[0][0] == "qwen-mt-plus"
+
+
+def test_throttle_uses_cooldown_only(clock):
+    router = ModelRouter()
+    router.record("qwen-mt-plus", LONG_TEXT, 0.1, False, throttled=True)
+    ranked, reason = router.rank(LONG_TEXT)
+    assert ranked == ["qwen-turbo-latest", "qwen-mt-plus"]
+    assert "被限流" in reason
+    assert len(router.stats["qwen-mt-plus"]["results"]) == 0
+
+    clock[0] += ROUTER_THROTTLE_COOLDOWN + 1
+    assert router.rank(LONG_TEXT)[0][0] == "qwen-mt-plus"
+
+
+def test_latency_only_counts_successful_calls(clock):
+    router = ModelRouter()
+    router.record("qwen-mt-plus", LONG_TEXT, 10.0, True)
+    router.record("qwen-mt-plus", LONG_TEXT, 0.01, False)
+    assert router.stats["qwen-mt-plus"]["latency"] == 10.0
+
+
+def test_all_models_over_budget_ranks_by_cost():
+    router = ModelRouter(budget=0.01)
+    router.spent = 0.02
+    ranked, reason = router.rank(LONG_TEXT)
+    assert ranked == ["qwen-turbo-latest", "qwen-mt-plus"]
+    assert "超出预算" in reason
+
+
+def test_reservation_counts_toward_budget(clock):
+    cost = ModelRouter().estimate_cost("qwen-mt-plus", LONG_TEXT)
+    router = ModelRouter(budget=cost * 1.5)
+
+    reserved = router.reserve("qwen-mt-plus", LONG_TEXT)
+    assert router.rank(LONG_TEXT)[0][0] == "qwen-turbo-latest"
+
+    router.record("qwen-mt-plus", LONG_TEXT, 1.0, True, reserved=reserved)
+    assert router.reserved == pytest.approx(0.0)
+    assert router.spent == pytest.approx(cost)
+
+
+def test_exclude_removes_tried_models():
+    router = ModelRouter()
+    assert router.rank(LONG_TEXT, exclude=["qwen-mt-plus"])[0] == ["qwen-turbo-latest"]